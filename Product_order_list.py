@@ -1,173 +1,85 @@
 import streamlit as st
 import pandas as pd
 import os
-from datetime import datetime
-import uuid
 
-# Optional PDF library
-try:
-    from fpdf import FPDF
-    PDF_OK = True
-except:
-    PDF_OK = False
+from core import (
+    LEGACY_ORDER_FILE,
+    ORDER_FILE,
+    PDF_OK,
+    add_to_cart,
+    append_product,
+    category_options,
+    clear_cart,
+    compute_totals,
+    daily_summary,
+    flush_orders,
+    has_orders,
+    load_orders,
+    load_products,
+    migrate_legacy_orders,
+    orders_to_excel,
+    save_order,
+    submit_pdf
+)
 
 st.set_page_config(page_title="Product Order System", layout="wide", page_icon="🛒")
 
-PRODUCT_FILE = "product_template.xlsx"
-ORDER_FILE = "orders.xlsx"
-
-
-# -------------------------
-# LOAD PRODUCTS
-# -------------------------
-@st.cache_data
-def load_products():
-
-    df = pd.read_excel(PRODUCT_FILE)
-
-    # Clean column names
-    df.columns = df.columns.str.strip()
-
-    required_cols = [
-        "Product",
-        "ProductList",
-        "Supplier",
-        "Price",
-        "Category",
-        "CategoryDisplay",
-        "Product No",
-        "Image"  # REQUIRED for images
-    ]
-
-    # Add missing columns
-    for col in required_cols:
-        if col not in df.columns:
-            df[col] = ""
-
-    # Price numeric
-    df["Price"] = pd.to_numeric(df["Price"], errors="coerce").fillna(0)
-
-    # Extract category if blank
-    def extract_category(x):
-        s = str(x)
-        if "_" in s:
-            return s.split("_")[0]
-        return "General"
-
-    df["Category"] = df["Category"].replace("", pd.NA)
-    df["Category"] = df["Category"].fillna(df["ProductList"].apply(extract_category))
-
-    # Category Display fallback
-    df["CategoryDisplay"] = df["CategoryDisplay"].replace("", pd.NA)
-    df["CategoryDisplay"] = df["CategoryDisplay"].fillna(df["Category"])
-
-    return df
-
+ORDERS_DISPLAY_ROWS = 1000  # most recent order lines shown in the report
+NO_WEIGHT_CATEGORIES = frozenset({"bread", "packing"})  # lowercased Category values
 
 df = load_products()
 
-
-# -------------------------
-# CART LOGIC
-# -------------------------
 if "cart" not in st.session_state:
-    st.session_state.cart = []
-
-
-def add_to_cart(product, supplier, price, qty, weight):
-    st.session_state.cart.append({
-        "OrderID": None,
-        "Product": product,
-        "Supplier": supplier,
-        "Price": float(price),
-        "Qty": int(qty),
-        "Weight": weight,
-        "LineTotal": float(price) * int(qty)
-    })
-
-
-def clear_cart():
-    st.session_state.cart = []
-
-
-def compute_totals(discount_pct=0):
-    dfc = pd.DataFrame(st.session_state.cart)
-    if dfc.empty:
-        return 0, 0, 0
-    subtotal = dfc["LineTotal"].sum()
-    discount = subtotal * (discount_pct / 100)
-    total = subtotal - discount
-    return subtotal, discount, total
-
-
-def save_order(cart, discount_pct):
-    order_id = str(uuid.uuid4()).split("-")[0].upper()
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    rows = []
-    for c in cart:
-        rows.append({
-            "OrderID": order_id,
-            "Timestamp": now,
-            "Product": c["Product"],
-            "Supplier": c["Supplier"],
-            "Price": c["Price"],
-            "Qty": c["Qty"],
-            "Weight": c["Weight"],
-            "LineTotal": c["LineTotal"],
-            "DiscountPct": discount_pct
-        })
-
-    df_new = pd.DataFrame(rows)
-
-    if os.path.exists(ORDER_FILE):
-        df_old = pd.read_excel(ORDER_FILE)
-        df_out = pd.concat([df_old, df_new], ignore_index=True)
-    else:
-        df_out = df_new
+    clear_cart()
 
-    df_out.to_excel(ORDER_FILE, index=False)
-    return order_id, df_new
+try:
+    migrate_legacy_orders()
+except Exception as e:
+    # Not cached on failure, so the import is retried once the file is fixed
+    st.warning(f"Could not import old orders from {LEGACY_ORDER_FILE}: {e}")
 
 
-def create_pdf(order_id, df_order, subtotal, discount_val, total):
-    if not PDF_OK:
-        return None
+# -------------------------
+# PRODUCT CARD
+# -------------------------
+# Fragment: qty/weight edits rerun only this card, not the whole grid
+@st.fragment
+def render_card(prod, idx):
 
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
+    # -------------------------
+    # IMAGE HANDLING (Same folder)
+    # -------------------------
+    image_file = prod["Image"]  # stripped, "" when blank (see load_products)
 
-    pdf.cell(200, 10, f"Receipt - Order {order_id}", ln=True, align="C")
-    pdf.cell(200, 8, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
+    if prod["_img_ok"]:  # checked once in load_products, no stat per rerun
+        st.image(image_file, use_container_width=True)
+    elif image_file:
+        st.warning(f"Image not found: {image_file}")
+    else:
+        st.info("No image")
 
-    pdf.ln(5)
-    pdf.set_font("Arial", "B", 11)
-    pdf.cell(70, 8, "Product", border=1)
-    pdf.cell(20, 8, "Qty", border=1)
-    pdf.cell(25, 8, "Weight", border=1)
-    pdf.cell(30, 8, "Price", border=1)
-    pdf.cell(30, 8, "Total", border=1, ln=True)
+    # -------------------------
+    # PRODUCT INFO
+    # -------------------------
+    st.markdown(f"### {prod['Product']}")
+    st.write(f"Supplier: {prod['Supplier']}")
+    st.write(f"Price: ₹{prod['Price']:.2f}")
 
-    pdf.set_font("Arial", size=11)
-    for _, r in df_order.iterrows():
-        pdf.cell(70, 8, r["Product"][:25], border=1)
-        pdf.cell(20, 8, str(r["Qty"]), border=1)
-        pdf.cell(25, 8, str(r["Weight"]), border=1)
-        pdf.cell(30, 8, f"₹{r['Price']:.2f}", border=1)
-        pdf.cell(30, 8, f"₹{r['LineTotal']:.2f}", border=1, ln=True)
+    qty = st.number_input(f"Qty-{idx}", min_value=1, value=1)
 
-    pdf.ln(5)
-    pdf.cell(120, 8, "Subtotal:", align="R")
-    pdf.cell(30, 8, f"₹{subtotal:.2f}", ln=True)
-    pdf.cell(120, 8, "Discount:", align="R")
-    pdf.cell(30, 8, f"₹{discount_val:.2f}", ln=True)
-    pdf.cell(120, 10, "Total:", align="R")
-    pdf.cell(30, 10, f"₹{total:.2f}", ln=True)
+    # -------------------------
+    # WEIGHT LOGIC
+    # -------------------------
+    if str(prod["Category"]).strip().lower() in NO_WEIGHT_CATEGORIES:
+        weight = ""
+        st.write("Weight: Not required")
+    else:
+        weight = st.text_input(f"Weight-{idx}", placeholder="500g / 1kg")
 
-    out = f"receipt_{order_id}.pdf"
-    pdf.output(out)
-    return out
+    if st.button("Add to Cart", key=f"add_{idx}"):
+        add_to_cart(prod["Product"], prod["Supplier"], prod["Price"], qty, weight)
+        st.toast(f"Added {prod['Product']}")
+        st.rerun()  # whole app, so the sidebar cart picks up the new line
 
 
 # -------------------------
@@ -188,15 +100,12 @@ if page == "Order":
         q = st.text_input("Search product")
 
     with col2:
-        cat = st.selectbox(
-            "Category",
-            ["All"] + sorted(df["CategoryDisplay"].unique().tolist())
-        )
+        cat = st.selectbox("Category", category_options())
 
-    mask = (
-        df["Product"].str.contains(q, case=False, na=False)
-        | df["ProductList"].str.contains(q, case=False, na=False)
-    )
+    # Empty search (the usual state) matches everything; skip the scan
+    mask = pd.Series(True, index=df.index)
+    if q:
+        mask &= df["_search"].str.contains(q.lower(), regex=False, na=False)
 
     if cat != "All":
         mask &= df["CategoryDisplay"] == cat
@@ -217,50 +126,14 @@ if page == "Order":
             prod = filtered.iloc[idx]
 
             with col:
-
-                # -------------------------
-                # IMAGE HANDLING (Same folder)
-                # -------------------------
-                image_file = str(prod["Image"]).strip()
-
-                if image_file and os.path.exists(image_file):
-                    st.image(image_file, use_container_width=True)
-                elif image_file:
-                    st.warning(f"Image not found: {image_file}")
-                else:
-                    st.info("No image")
-
-                # -------------------------
-                # PRODUCT INFO
-                # -------------------------
-                st.markdown(f"### {prod['Product']}")
-                st.write(f"Supplier: {prod['Supplier']}")
-                st.write(f"Price: ₹{prod['Price']:.2f}")
-
-                qty = st.number_input(f"Qty-{idx}", min_value=1, value=1)
-
-                # -------------------------
-                # WEIGHT LOGIC
-                # -------------------------
-                category_value = str(prod["Category"]).strip().lower()
-                no_weight_categories = ["bread_product", "packing_product"]
-
-                if category_value in no_weight_categories:
-                    weight = ""
-                    st.write("Weight: Not required")
-                else:
-                    weight = st.text_input(f"Weight-{idx}", placeholder="500g / 1kg")
-
-                if st.button("Add to Cart", key=f"add_{idx}"):
-                    add_to_cart(prod["Product"], prod["Supplier"], prod["Price"], qty, weight)
-                    st.success(f"Added {prod['Product']}")
+                render_card(prod, idx)
 
     # -------------------------
     # CART SIDEBAR
     # -------------------------
     st.sidebar.header("🧾 Cart")
 
-    if st.session_state.cart:
+    if st.session_state.cart["Product"]:
 
         df_cart = pd.DataFrame(st.session_state.cart)
         st.sidebar.table(df_cart[["Product", "Qty", "Weight", "Price", "LineTotal"]])
@@ -277,18 +150,16 @@ if page == "Order":
 
         if st.sidebar.button("Save Order"):
             order_id, df_saved = save_order(st.session_state.cart, discount_pct)
-            pdf_path = create_pdf(order_id, df_saved, subtotal, disc, total)
 
             clear_cart()
             st.success(f"Order {order_id} saved!")
 
-            if pdf_path:
-                st.download_button(
-                    "Download Receipt (PDF)",
-                    data=open(pdf_path, "rb").read(),
-                    file_name=pdf_path,
-                    mime="application/pdf"
-                )
+            # A new order replaces any earlier receipt still on screen
+            st.session_state.pop("receipt", None)
+
+            if PDF_OK:
+                future = submit_pdf(order_id, df_saved, subtotal, disc, total)
+                st.session_state.receipt = (order_id, future, df_saved)
             else:
                 st.download_button(
                     "Download Order CSV",
@@ -299,6 +170,36 @@ if page == "Order":
     else:
         st.sidebar.info("Cart is empty.")
 
+    # -------------------------
+    # RECEIPT (rendered in the background)
+    # -------------------------
+    if "receipt" in st.session_state:
+        receipt_id, future, df_receipt = st.session_state.receipt
+
+        def _clear_receipt():
+            st.session_state.pop("receipt", None)
+
+        if not future.done():
+            st.info(f"Preparing receipt for order {receipt_id}...")
+            st.button("Refresh receipt")
+        elif future.exception():
+            # Same fallback as when PDF support is missing
+            st.error(f"Receipt for order {receipt_id} failed: {future.exception()}")
+            st.download_button(
+                "Download Order CSV",
+                data=df_receipt.to_csv(index=False),
+                file_name=f"order_{receipt_id}.csv",
+                on_click=_clear_receipt
+            )
+        else:
+            st.download_button(
+                "Download Receipt (PDF)",
+                data=future.result(),
+                file_name=f"receipt_{receipt_id}.pdf",
+                mime="application/pdf",
+                on_click=_clear_receipt
+            )
+
 
 # -------------------------
 # PAGE: ADD PRODUCT
@@ -317,7 +218,6 @@ elif page == "Add Product":
         if not p_list:
             st.error("ProductList is required")
         else:
-            df_old = pd.read_excel(PRODUCT_FILE)
             new_row = {
                 "ProductList": p_list,
                 "Product": p_name or p_list,
@@ -325,8 +225,9 @@ elif page == "Add Product":
                 "Price": p_price,
                 "Image": p_image
             }
-            df_out = pd.concat([df_old, pd.DataFrame([new_row])], ignore_index=True)
-            df_out.to_excel(PRODUCT_FILE, index=False)
+            append_product(new_row)
+            load_products.clear()
+            category_options.clear()
             st.success("Product added successfully!")
 
 
@@ -337,23 +238,23 @@ elif page == "Orders Report":
 
     st.title("📊 Orders Report")
 
-    if os.path.exists(ORDER_FILE):
-        df_orders = pd.read_excel(ORDER_FILE)
-        st.dataframe(df_orders)
+    flush_orders()  # include orders still waiting in the write-back queue
 
-        df_orders["Timestamp"] = pd.to_datetime(df_orders["Timestamp"])
+    mtime = os.path.getmtime(ORDER_FILE) if has_orders() else None
+    tbl = load_orders(mtime) if mtime is not None else None
 
-        daily = df_orders.groupby(df_orders["Timestamp"].dt.date).agg(
-            Revenue=("LineTotal", "sum"),
-            Orders=("OrderID", pd.Series.nunique)
-        )
+    # A store with nothing readable in it comes back without columns
+    if tbl is not None and tbl.num_columns:
+        # Only the latest lines go to the browser, not the whole history
+        st.dataframe(tbl.slice(max(0, tbl.num_rows - ORDERS_DISPLAY_ROWS)))
 
         st.subheader("Daily Summary")
-        st.table(daily)
+        st.table(daily_summary(mtime))
 
+        # Excel is only built when the button is clicked
         st.download_button(
             "Download Orders Excel",
-            data=open(ORDER_FILE, "rb").read(),
+            data=lambda: orders_to_excel(tbl.to_pandas()),
             file_name="orders.xlsx",
             mime="application/vnd.ms-excel"
         )
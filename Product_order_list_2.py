@@ -1,91 +1,14 @@
 import os
-import pandas as pd
-from PIL import Image, ImageDraw, ImageFont
+from concurrent.futures import ThreadPoolExecutor
 
-# ---------------------------------------------------------
-# FOLDER FOR AUTO-GENERATED IMAGES
-# ---------------------------------------------------------
-IMAGE_FOLDER = "generated_images"
-
-if not os.path.exists(IMAGE_FOLDER):
-    os.makedirs(IMAGE_FOLDER)
-
-
-# ---------------------------------------------------------
-# FIX: REPLACEMENT FOR DEPRECATED textsize()
-# ---------------------------------------------------------
-def get_text_size(draw, text, font):
-    """Get text width and height using textbbox() (Pillow 10 compatible)."""
-    bbox = draw.textbbox((0, 0), text, font=font)
-    return bbox[2] - bbox[0], bbox[3] - bbox[1]
-
-
-# ---------------------------------------------------------
-# PLACEHOLDER IMAGE GENERATOR
-# ---------------------------------------------------------
-def generate_placeholder(product_name: str) -> str:
-
-    # Clean special chars → safe filename
-    safe_name = "".join(
-        c if c.isalnum() or c in " _-" else "_"
-        for c in str(product_name)
-    ).strip()
-
-    if safe_name == "":
-        safe_name = "product"
-
-    file_name = f"{safe_name}.png"
-    img_path = os.path.join(IMAGE_FOLDER, file_name)
-
-    # If file already generated → return it
-    if os.path.exists(img_path):
-        return img_path
-
-    # Create placeholder 360x240
-    width, height = 360, 240
-    img = Image.new("RGB", (width, height), color=(245, 245, 245))
-    draw = ImageDraw.Draw(img)
-
-    # Load font
-    try:
-        font = ImageFont.truetype("arial.ttf", 18)
-    except:
-        font = ImageFont.load_default()
-
-    text = str(product_name)
-
-    # Measure text
-    w, h = get_text_size(draw, text, font)
-
-    # If too long → split in two lines
-    if w > width - 40:
-        parts = text.split()
-        mid = len(parts) // 2
-        line1 = " ".join(parts[:mid])
-        line2 = " ".join(parts[mid:])
-
-        w1, h1 = get_text_size(draw, line1, font)
-        w2, h2 = get_text_size(draw, line2, font)
-
-        draw.text(((width - w1) / 2, height / 2 - 20), line1, fill="black", font=font)
-        draw.text(((width - w2) / 2, height / 2 + 5), line2, fill="black", font=font)
-
-    else:
-        draw.text(((width - w) / 2, (height - h) / 2), text, fill="black", font=font)
-
-    # Border box
-    draw.rectangle([1, 1, width - 2, height - 2], outline=(200, 200, 200))
-
-    img.save(img_path, format="PNG")
-
-    return img_path
+from core import IMAGE_FOLDER, generate_placeholder, read_workbook, safe_file_name
 
 
 # ---------------------------------------------------------
 # LOAD PRODUCT LIST WITH WEIGHT SUPPORT
 # ---------------------------------------------------------
 def load_products():
-    df = pd.read_excel("product_list.xlsx")
+    df = read_workbook("product_list.xlsx")
 
     # Ensure columns exist
     if "Product" not in df.columns:
@@ -94,8 +17,19 @@ def load_products():
     if "Weight" not in df.columns:
         df["Weight"] = ""    # Auto-add empty weight column
 
-    # Create placeholder image per product
-    df["Image"] = df["Product"].astype(str).apply(generate_placeholder)
+    # One directory scan instead of a stat per product; only missing images get rendered
+    os.makedirs(IMAGE_FOLDER, exist_ok=True)
+    existing = {e.name for e in os.scandir(IMAGE_FOLDER)}
+    names = df["Product"].astype("string").fillna("").tolist()
+    file_names = [safe_file_name(n) for n in names]
+    missing = [n for n, f in zip(names, file_names) if f not in existing]
+
+    # Create placeholder image per product (PNG encoding releases the GIL)
+    if missing:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+            list(ex.map(generate_placeholder, missing))
+
+    df["Image"] = [os.path.join(IMAGE_FOLDER, f) for f in file_names]
 
     return df
 
@@ -0,0 +1,560 @@
+import streamlit as st
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import os
+import re
+import math
+import atexit
+import logging
+import threading
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from openpyxl import load_workbook
+from io import BytesIO
+from datetime import datetime
+import secrets
+from PIL import Image, ImageDraw, ImageFont
+
+# Optional PDF library (fpdf2; the old fpdf 1.x has no table support)
+try:
+    from fpdf import FPDF
+    PDF_OK = hasattr(FPDF, "table")
+except:
+    PDF_OK = False
+
+# Optional fast Excel reader (Rust based), openpyxl otherwise
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+# Optional streaming Excel writer for the orders download
+try:
+    import xlsxwriter
+    XLSX_OK = True
+except ImportError:
+    XLSX_OK = False
+
+PRODUCT_FILE = "product_template.xlsx"
+ORDER_FILE = "orders.parquet"  # directory, one parquet fragment per saved order
+LEGACY_ORDER_FILE = "orders.xlsx"
+ORDER_FLUSH_DELAY = 2.0  # seconds of saves coalesced into one fragment
+CACHE_DIR = ".cache"
+CACHE_VERSION = 7  # bump when load_products changes the frame it returns
+
+IMAGE_FOLDER = "generated_images"
+FONT_SIZE = 18
+
+# Every fragment is written with the same schema so the directory reads back as one table
+ORDER_DTYPES = {
+    "OrderID": "string",
+    "Timestamp": "datetime64[us]",
+    "Product": "string",
+    "Supplier": "string",
+    "Price": "float64",
+    "Qty": "Int64",  # nullable: a blank legacy cell stays missing instead of failing the cast
+    "Weight": "string",
+    "LineTotal": "float64",
+    "DiscountPct": "float64"
+}
+
+
+# -------------------------
+# LOAD PRODUCTS
+# -------------------------
+def _cache_key(path):
+    return hashlib.sha1(
+        f"{path}:{os.path.getmtime(path)}:{os.path.getsize(path)}:{CACHE_VERSION}".encode()
+    ).hexdigest()[:16]
+
+
+def read_workbook(path):
+    """First sheet of an .xlsx as a DataFrame (header row = column names)."""
+    if EXCEL_ENGINE == "calamine":
+        return pd.read_excel(path, engine=EXCEL_ENGINE)
+
+    # Without calamine, stream rows with openpyxl read_only instead of letting
+    # read_excel build the whole workbook in memory
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()  # stored dimensions are often wrong; size from the data
+        rows = ws.values
+        header = next(rows, ())
+        n = len(header)
+        # Same header names read_excel would produce ("Unnamed: 3", "Price.1")
+        columns, seen = [], {}
+        for i, c in enumerate(header):
+            c = f"Unnamed: {i}" if c is None else c
+            if c in seen:
+                seen[c] += 1
+                c = f"{c}.{seen[c]}"
+            else:
+                seen[c] = 0
+            columns.append(c)
+        data = [row[:n] + (None,) * (n - len(row)) for row in rows]
+    finally:
+        wb.close()
+
+    return pd.DataFrame(data, columns=columns).dropna(how="all").reset_index(drop=True)
+
+
+def _read_products():
+
+    # Disk cache survives restarts; a new key is produced whenever the Excel file changes
+    cache_path = os.path.join(CACHE_DIR, f"products-{_cache_key(PRODUCT_FILE)}.parquet")
+    if os.path.exists(cache_path):
+        try:
+            return pd.read_parquet(cache_path)
+        except Exception:
+            pass  # unreadable snapshot: rebuild it from the workbook below
+
+    df = read_workbook(PRODUCT_FILE)
+
+    # Clean column names
+    df.columns = df.columns.str.strip()
+
+    required_cols = [
+        "Product",
+        "ProductList",
+        "Supplier",
+        "Price",
+        "Category",
+        "CategoryDisplay",
+        "Product No",
+        "Image"  # REQUIRED for images
+    ]
+
+    # Drop duplicate headers and add missing columns in one allocation
+    df = df.loc[:, ~df.columns.duplicated()]
+    df = df.reindex(columns=list(dict.fromkeys(df.columns.tolist() + required_cols)), fill_value="")
+
+    # Arrow-backed text straight after the read, so the .str calls below work on it
+    # directly instead of on astype(str) copies
+    for col in ["Product", "ProductList", "Image"]:
+        df[col] = df[col].astype("string[pyarrow]")
+    df["Image"] = df["Image"].fillna("").str.strip()
+
+    # Price numeric
+    df["Price"] = pd.to_numeric(df["Price"], errors="coerce").fillna(0)
+
+    # Extract category if blank: text before the first "_", else "General"
+    product_list = df["ProductList"]
+    extracted = product_list.str.split("_", n=1).str[0].where(
+        product_list.str.contains("_", regex=False, na=False), "General"
+    )
+
+    df["Category"] = df["Category"].replace("", pd.NA)
+    df["Category"] = df["Category"].fillna(extracted)
+
+    # Category Display fallback
+    df["CategoryDisplay"] = df["CategoryDisplay"].replace("", pd.NA)
+    df["CategoryDisplay"] = df["CategoryDisplay"].fillna(df["Category"])
+
+    # Lowercased search text, built once instead of on every keystroke.
+    # "\x00" keeps a query from matching across the two fields.
+    # fillna first: a blank cell would otherwise null out the whole row's search text.
+    df["_search"] = (df["Product"].fillna("") + "\x00" + df["ProductList"].fillna("")).str.lower()
+
+    # Categoricals for low-cardinality columns
+    for col in ["Category", "CategoryDisplay", "Supplier"]:
+        df[col] = df[col].astype("category")
+
+    # Best effort: drop stale snapshots (and leftover temp files), then write the
+    # new one under a temp name so a crash mid-write never leaves a truncated
+    # file behind under a valid key
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        for name in os.listdir(CACHE_DIR):
+            if name.startswith("products-"):
+                os.remove(os.path.join(CACHE_DIR, name))
+        df.to_parquet(tmp_path, compression="zstd")
+        os.replace(tmp_path, cache_path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    return df
+
+
+# cache_resource hands every rerun the same frame instead of a pickled copy;
+# callers only filter and read it, never modify it in place
+@st.cache_resource
+def load_products():
+    df = _read_products()
+
+    # Resolved here, not in the disk snapshot, so newly added image files are picked up
+    # One listdir per image folder instead of one stat per product
+    def _key(path):
+        return os.path.normcase(os.path.normpath(path))
+
+    images = df["Image"].tolist()
+    present = set()
+    for folder in {os.path.dirname(_key(p)) for p in images if p}:
+        try:
+            present.update(_key(os.path.join(folder, name)) for name in os.listdir(folder or "."))
+        except OSError:
+            pass
+
+    # Names the listing does not match exactly (e.g. other letter case on macOS,
+    # where normcase is a no-op) still get a real stat, so only misses cost one
+    df["_img_ok"] = [bool(p) and (_key(p) in present or os.path.exists(p)) for p in images]
+
+    return df
+
+
+@st.cache_data
+def category_options():
+    # Categorical column: the categories are the distinct values, no scan needed
+    return ["All"] + sorted(load_products()["CategoryDisplay"].cat.categories.tolist())
+
+
+def append_product(new_row):
+    # Append one row in place instead of reading and rewriting the whole sheet
+    wb = load_workbook(PRODUCT_FILE)
+    ws = wb.active
+    header = ["" if c.value is None else str(c.value).strip() for c in ws[1]]
+    for key in new_row:
+        if key not in header:
+            header.append(key)
+            ws.cell(row=1, column=len(header), value=key)
+    ws.append([new_row.get(h) for h in header])
+    wb.save(PRODUCT_FILE)
+
+
+# -------------------------
+# CART LOGIC
+# -------------------------
+# Cart is kept column-wise, so it goes into a DataFrame in one step when shown or saved
+CART_COLUMNS = ("Product", "Supplier", "Price", "Qty", "Weight", "LineTotal")
+
+
+def add_to_cart(product, supplier, price, qty, weight):
+    cart = st.session_state.cart
+    cart["Product"].append(product)
+    cart["Supplier"].append(supplier)
+    cart["Price"].append(float(price))
+    cart["Qty"].append(int(qty))
+    cart["Weight"].append(weight)
+    cart["LineTotal"].append(float(price) * int(qty))
+
+
+def clear_cart():
+    st.session_state.cart = {col: [] for col in CART_COLUMNS}
+
+
+def compute_totals(discount_pct=0):
+    line_totals = st.session_state.cart["LineTotal"]
+    if not line_totals:
+        return 0, 0, 0
+    # Plain sum over the stored line totals; no DataFrame for a handful of numbers
+    subtotal = math.fsum(line_totals)
+    discount = subtotal * (discount_pct / 100)
+    total = subtotal - discount
+    return subtotal, discount, total
+
+
+# -------------------------
+# ORDERS
+# -------------------------
+def save_order(cart, discount_pct):
+    order_id = secrets.token_hex(4).upper()
+    now = pd.Timestamp.now().floor("s")
+
+    df_new = pd.DataFrame({
+        "OrderID": order_id,
+        "Timestamp": now,
+        **cart,
+        "DiscountPct": discount_pct
+    })
+
+    # Queued; the timer writes every order saved within ORDER_FLUSH_DELAY in one go
+    global _flush_timer
+    with _pending_lock:
+        _pending_orders.append(df_new)
+        if _flush_timer is None:
+            _flush_timer = threading.Timer(ORDER_FLUSH_DELAY, flush_orders)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+    return order_id, df_new
+
+
+_pending_orders: list[pd.DataFrame] = []
+_pending_lock = threading.Lock()
+_flush_timer = None
+
+# Held for a whole flush, so a caller returns only once queued orders are on disk,
+# even when the timer's flush is already running
+_write_lock = threading.Lock()
+
+log = logging.getLogger(__name__)
+
+
+def flush_orders():
+    global _flush_timer
+    with _write_lock:
+        with _pending_lock:
+            if _flush_timer is not None:
+                _flush_timer.cancel()
+                _flush_timer = None
+            batch = _pending_orders[:]
+            _pending_orders.clear()
+
+        if not batch:
+            return
+
+        # Append only: earlier orders are never re-read or rewritten
+        first = batch[0]
+        name = f"{first['Timestamp'].iloc[0]:%Y%m%d%H%M%S}-{first['OrderID'].iloc[0]}.parquet"
+        try:
+            write_order_fragment(pd.concat(batch, ignore_index=True), name)
+        except Exception:
+            # Orders were already confirmed to the user: keep them for the next flush
+            log.exception("Writing %d queued order(s) failed; kept for the next flush", len(batch))
+            with _pending_lock:
+                _pending_orders[:0] = batch
+
+
+atexit.register(flush_orders)
+
+
+def write_order_fragment(df_part, name):
+    df_part = df_part.reindex(columns=list(ORDER_DTYPES)).fillna({"Weight": ""})
+
+    # Malformed cells (mostly from the legacy workbook) become missing values
+    # rather than failing the cast below
+    for col, dtype in ORDER_DTYPES.items():
+        if dtype.startswith("datetime"):
+            df_part[col] = pd.to_datetime(df_part[col], errors="coerce")
+        elif dtype != "string":
+            df_part[col] = pd.to_numeric(df_part[col], errors="coerce")
+    df_part = df_part.astype(ORDER_DTYPES)
+
+    # Written next to the store under a dot name, then moved in with os.replace:
+    # readers never see a half-written fragment, and the store directory only
+    # appears once it holds a complete one
+    tmp_path = os.path.join(os.path.dirname(ORDER_FILE) or ".", f".{name}.tmp")
+    try:
+        df_part.to_parquet(tmp_path, index=False)
+        os.makedirs(ORDER_FILE, exist_ok=True)
+        os.replace(tmp_path, os.path.join(ORDER_FILE, name))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def has_orders():
+    # An existing but empty store (e.g. left by an interrupted write) counts as none
+    return os.path.isdir(ORDER_FILE) and any(
+        not name.startswith((".", "_")) for name in os.listdir(ORDER_FILE)
+    )
+
+
+@st.cache_resource(show_spinner=False)  # once per server process, not per rerun
+def migrate_legacy_orders():
+    # One-off import of the old orders.xlsx into the parquet store
+    if has_orders() or not os.path.exists(LEGACY_ORDER_FILE):
+        return
+    df_old = read_workbook(LEGACY_ORDER_FILE)
+    write_order_fragment(df_old, "00000000000000-legacy.parquet")
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)  # immutable Arrow table; only the latest mtime is kept
+def load_orders(mtime):
+    # mtime is only the cache key: every saved order changes the store's mtime.
+    # Repeating text is dictionary-encoded: one copy per distinct value, and
+    # to_pandas() hands these columns back as categoricals.
+    tbl = pq.read_table(ORDER_FILE, read_dictionary=["OrderID", "Product", "Supplier"])
+    return tbl.unify_dictionaries()  # fragments each bring their own dictionary
+
+
+@st.cache_data(show_spinner=False, max_entries=1)  # only the latest mtime, like load_orders
+def daily_summary(mtime):
+    # Stays in Arrow; Timestamp is stored typed, so no parsing
+    tbl = load_orders(mtime)
+    day = pc.strftime(tbl["Timestamp"], format="%Y-%m-%d")
+    return (
+        tbl.select(["LineTotal", "OrderID"])
+        .append_column("Day", day)
+        .group_by("Day")
+        .aggregate([("LineTotal", "sum"), ("OrderID", "count_distinct")])
+        .sort_by("Day")
+        .to_pandas()
+        .rename(columns={"LineTotal_sum": "Revenue", "OrderID_count_distinct": "Orders"})
+        .set_index("Day")
+    )
+
+
+def orders_to_excel(df_orders):
+    buf = BytesIO()
+    if not XLSX_OK:
+        df_orders.to_excel(buf, index=False)
+        return buf.getvalue()
+
+    # constant_memory flushes each row once the next one starts, so the sheet is
+    # never held in memory. pandas writes column by column, which that mode
+    # would silently truncate, hence the row loop here.
+    wb = xlsxwriter.Workbook(buf, {"constant_memory": True, "default_date_format": "yyyy-mm-dd hh:mm:ss"})
+    ws = wb.add_worksheet()
+    ws.write_row(0, 0, df_orders.columns.tolist())
+    values = df_orders.astype(object).where(df_orders.notna(), None)
+    for i, row in enumerate(values.itertuples(index=False, name=None), start=1):
+        ws.write_row(i, 0, row)
+    wb.close()
+    return buf.getvalue()
+
+
+# -------------------------
+# PDF RECEIPT
+# -------------------------
+def _latin1(text):
+    # fpdf2 core fonts only cover latin-1; anything else becomes "?" instead of raising
+    return str(text).encode("latin-1", "replace").decode("latin-1")
+
+
+def create_pdf(order_id, df_order, subtotal, discount_val, total):
+    if not PDF_OK:
+        return None
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("helvetica", size=12)
+
+    pdf.cell(200, 10, f"Receipt - Order {order_id}", new_x="LMARGIN", new_y="NEXT", align="C")
+    pdf.cell(200, 8, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", new_x="LMARGIN", new_y="NEXT")
+
+    # Format every line up front, then hand finished rows to FPDF.
+    # "Rs." rather than "₹": the rupee sign is outside the core fonts' latin-1 range.
+    rows = [
+        [_latin1(product[:25]), str(qty), _latin1(weight), f"Rs.{price:.2f}", f"Rs.{line_total:.2f}"]
+        for product, qty, weight, price, line_total in zip(
+            df_order["Product"].astype(str),
+            df_order["Qty"].to_numpy(),
+            df_order["Weight"].astype(str),
+            df_order["Price"].to_numpy(),
+            df_order["LineTotal"].to_numpy()
+        )
+    ]
+
+    pdf.ln(5)
+    pdf.set_font("helvetica", size=11)
+    with pdf.table(col_widths=(70, 20, 25, 30, 30), width=175, align="LEFT", line_height=8) as table:
+        add_row = table.row  # local name, looked up once per receipt
+        add_row(["Product", "Qty", "Weight", "Price", "Total"])  # heading row, bold
+        for row in rows:
+            add_row(row)
+
+    pdf.ln(5)
+    pdf.cell(120, 8, "Subtotal:", align="R")
+    pdf.cell(30, 8, f"Rs.{subtotal:.2f}", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(120, 8, "Discount:", align="R")
+    pdf.cell(30, 8, f"Rs.{discount_val:.2f}", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(120, 10, "Total:", align="R")
+    pdf.cell(30, 10, f"Rs.{total:.2f}", new_x="LMARGIN", new_y="NEXT")
+
+    # fpdf2 returns the document in memory as a bytearray
+    return bytes(pdf.output())
+
+
+# Receipts render off the script thread so Save Order returns immediately
+_pdf_executor = ThreadPoolExecutor(max_workers=2)
+
+
+def submit_pdf(order_id, df_order, subtotal, discount_val, total):
+    return _pdf_executor.submit(create_pdf, order_id, df_order, subtotal, discount_val, total)
+
+
+# -------------------------
+# PLACEHOLDER IMAGES
+# -------------------------
+@lru_cache(maxsize=None)
+def _font(size=FONT_SIZE):
+    # Parsed on first use, then shared by every placeholder
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except:
+        return ImageFont.load_default()
+
+
+def get_text_size(draw, text, font):
+    """Get text width and height using textbbox() (Pillow 10 compatible)."""
+    bbox = draw.textbbox((0, 0), text, font=font)
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+
+@lru_cache(maxsize=4096)
+def _measure(text: str, font_size: int) -> tuple[float, float]:
+    """Memoized get_text_size() on a throwaway canvas; names often share words."""
+    return get_text_size(ImageDraw.Draw(Image.new("RGB", (1, 1))), text, _font(font_size))
+
+
+@lru_cache(maxsize=4096)
+def _text_width(text: str, font_size: int) -> float:
+    """Advance width only; textlength skips the vertical metrics textbbox needs."""
+    return ImageDraw.Draw(Image.new("RGB", (1, 1))).textlength(text, font=_font(font_size))
+
+
+# \w is exactly str.isalnum() plus "_", so names map to the same files as before
+_UNSAFE_CHARS = re.compile(r"[^\w -]")
+
+
+def safe_file_name(product_name: str) -> str:
+
+    # Clean special chars → safe filename
+    safe_name = _UNSAFE_CHARS.sub("_", str(product_name)).strip()
+
+    if safe_name == "":
+        safe_name = "product"
+
+    return f"{safe_name}.png"
+
+
+def generate_placeholder(product_name: str) -> str:
+
+    img_path = os.path.join(IMAGE_FOLDER, safe_file_name(product_name))
+
+    # If file already generated → return it
+    if os.path.exists(img_path):
+        return img_path
+
+    # Create placeholder 240x160 (grid thumbnails are scaled client side)
+    width, height = 240, 160
+    img = Image.new("RGB", (width, height), color=(245, 245, 245))
+    draw = ImageDraw.Draw(img)
+
+    font = _font(FONT_SIZE)
+
+    text = str(product_name)
+
+    # If too long → split in two lines (only widths are needed here)
+    if _text_width(text, FONT_SIZE) > width - 40:
+        parts = text.split()
+        mid = len(parts) // 2
+        line1 = " ".join(parts[:mid])
+        line2 = " ".join(parts[mid:])
+
+        w1 = _text_width(line1, FONT_SIZE)
+        w2 = _text_width(line2, FONT_SIZE)
+
+        draw.text(((width - w1) / 2, height / 2 - 20), line1, fill="black", font=font)
+        draw.text(((width - w2) / 2, height / 2 + 5), line2, fill="black", font=font)
+
+    else:
+        w, h = _measure(text, FONT_SIZE)
+        draw.text(((width - w) / 2, (height - h) / 2), text, fill="black", font=font)
+
+    # Border box
+    draw.rectangle([1, 1, width - 2, height - 2], outline=(200, 200, 200))
+
+    # Flat background + text: a 16-colour palette PNG is far smaller than RGB
+    os.makedirs(IMAGE_FOLDER, exist_ok=True)
+    img.convert("P", palette=Image.Palette.ADAPTIVE, colors=16).save(img_path, format="PNG", optimize=True)
+
+    return img_path